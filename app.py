@@ -1,12 +1,15 @@
 import asyncio
 import logging
+import re
+import aiohttp
+import orjson
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import socketio
 import uvicorn
 from goldsrc_client import GoldSrcClient
-from cs16_parser import CS16ServerParser # Import the new parser
+from cs16_parser import CS16AsyncParser # Import the new parser
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
@@ -14,8 +17,17 @@ logger = logging.getLogger("App")
 
 app = FastAPI()
 
+# orjson instead of stdlib json for socket.io packet encoding
+class OrjsonModule:
+    @staticmethod
+    def dumps(obj, **kwargs):
+        # socket.io passes separators=(',', ':') - orjson output is always compact
+        return orjson.dumps(obj).decode()
+
+    loads = staticmethod(orjson.loads)
+
 # Socket.IO
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', json=OrjsonModule)
 socket_app = socketio.ASGIApp(sio, app)
 
 # Serve Static Files (at root, with html=True to serve index.html)
@@ -26,9 +38,170 @@ app.mount("/", StaticFiles(directory="public", html=True), name="public")
 # Since we mount at root as the last step (implicitly or explicitly), it catches everything not matched.
 # Note: FastAPI evaluates routes in order. We should remove the explicit @app.get("/") if we use mount at root.
 
+# Anything that isn't a digit in the port part of server_ip
+NON_DIGIT_RE = re.compile(r'\D')
+
 # State
 clients = {} # sid -> GoldSrcClient
 
+# One parser for every client so its caches and in-flight query coalescing are shared
+PARSER = CS16AsyncParser(timeout=2)
+
+# Player list polling
+POLL_INTERVAL = 5 # seconds between A2S_PLAYER queries
+INFO_REFRESH_TICKS = 6 # A2S_INFO every 6 polls (30s)
+MAX_POLL_DELAY = 60 # backoff cap for unreachable servers
+MAX_POLL_FAILURES = 5 # consecutive failures before a target is dropped
+POLL_METHODS = ('a2s',) # HTTP fallbacks ('api', 'web') can stall a tick for seconds - opt-in only
+targets = {} # (host, port) -> set of subscribed sids
+info_due = set() # targets with new subscribers that need A2S_INFO on the next tick
+poll_failures = {} # (host, port) -> consecutive failed polls
+poll_next = {} # (host, port) -> loop time of the next poll
+last_players = {} # (host, port) -> last player list sent, reused when A2S_PLAYER goes unanswered
+poll_wakeup = None # asyncio.Event, set by join_game so new subscribers don't wait for the next tick
+poller_task = None
+
+async def poll_target(session, target, refresh_info):
+    target_host, target_port = target
+    try:
+        # A2S_INFO (name, map) is mostly static - only refreshed every INFO_REFRESH_TICKS or for new subscribers.
+        # INFO and PLAYER exchanges run concurrently - both requests are on the wire before either reply is read
+        players_query = PARSER.query_players_advanced(target_host, target_port, session, POLL_METHODS)
+        info = None
+        if refresh_info:
+            info, players = await asyncio.gather(PARSER.query_info(target_host, target_port), players_query)
+            if not info:
+                logger.warning(f"Parser returned no server info for {target_host}:{target_port}")
+        else:
+            players = await players_query
+
+        if players is None:
+            logger.warning(f"No player list from {target_host}:{target_port}")
+            # Servers with player queries disabled still answer A2S_INFO (served from the parser cache while fresh)
+            if info is None:
+                info = await PARSER.query_info(target_host, target_port)
+            if info is None:
+                return False
+            frontend_players = last_players.get(target, [])
+        else:
+            logger.debug(f"Updated {len(players)} players from {target_host}:{target_port}")
+            # Parser returns (name, score, time) tuples - frontend only needs name/score
+            frontend_players = [{"name": name, "score": score, "time": 0} for name, score, _ in players]
+            last_players[target] = frontend_players
+
+        # One event per tick instead of server_info + player_list_update + console log
+        payload = {"info": info, "players": frontend_players}
+        for sid in list(targets.get(target, ())):
+            await sio.emit('server_state', payload, room=sid)
+        return True
+    except Exception as e:
+        logger.error(f"Poll task error: {e}")
+        return False
+
+def drop_target(target):
+    targets.pop(target, None)
+    info_due.discard(target)
+    poll_failures.pop(target, None)
+    poll_next.pop(target, None)
+    last_players.pop(target, None)
+    # The shared parser would otherwise keep caches for every server ever joined
+    PARSER.forget(*target)
+
+def release_client(sid):
+    # Close the sid's game client and unsubscribe it from that client's target
+    gs_client = clients.pop(sid, None)
+    if gs_client is None:
+        return
+    gs_client.close()
+
+    target = (gs_client.host, gs_client.port)
+    subscribers = targets.get(target)
+    if subscribers is not None:
+        subscribers.discard(sid)
+        if not subscribers:
+            drop_target(target)
+
+async def handle_poll_result(target, ok, now):
+    # Exponential backoff for servers that don't answer: 5s -> 10s -> 20s -> 40s -> 60s
+    if ok:
+        poll_failures.pop(target, None)
+        poll_next[target] = now + POLL_INTERVAL
+        return
+
+    fail_count = poll_failures.get(target, 0) + 1
+    if fail_count >= MAX_POLL_FAILURES:
+        host, port = target
+        logger.warning(f"{host}:{port} unreachable, stopping poller")
+        for sid in list(targets.get(target, ())):
+            await sio.emit('chat_message', {'user': 'System', 'text': f"Server {host}:{port} unreachable", 'type': 'system'}, room=sid)
+        drop_target(target)
+        return
+
+    poll_failures[target] = fail_count
+    poll_next[target] = now + min(MAX_POLL_DELAY, POLL_INTERVAL * 2 ** fail_count)
+
+async def global_poller(session):
+    # One poller (and one UDP endpoint) for all web clients, each unique server is queried once per tick.
+    # All targets are queried concurrently, so every request goes out before the replies are awaited
+    # logic: app.py handles A2S queries (stateless/UDP), GoldSrcClient handles Game Connection (Stateful)
+    logger.info("Starting global player poller")
+    tick = 0
+    woken = False
+    try:
+        while True:
+            try:
+                if targets:
+                    now = asyncio.get_running_loop().time()
+                    # An early wakeup only serves new subscribers, it doesn't count as a tick
+                    refresh_all = not woken and tick % INFO_REFRESH_TICKS == 0
+                    due = info_due.copy()
+                    info_due.clear()
+                    # Targets in backoff are skipped until their next poll time, new subscribers are polled right away
+                    polled = [target for target in targets if target in due or poll_next.get(target, 0) <= now]
+                    results = await asyncio.gather(*(
+                        poll_target(session, target, refresh_all or target in due)
+                        for target in polled
+                    ))
+                    for target, ok in zip(polled, results):
+                        if target in targets:
+                            await handle_poll_result(target, ok, now)
+                    if not woken:
+                        tick += 1
+            except Exception as e:
+                # Keep polling for everyone else
+                logger.error(f"Global poller error: {e}")
+
+            try:
+                await asyncio.wait_for(poll_wakeup.wait(), POLL_INTERVAL)
+                woken = True
+            except asyncio.TimeoutError:
+                woken = False
+            poll_wakeup.clear()
+    finally:
+        PARSER.close()
+
+http_session = None # shared aiohttp session for the HTTP player list fallbacks
+
+@app.on_event("startup")
+async def start_global_poller():
+    global http_session, poll_wakeup, poller_task
+    # Pooled keep-alive connections instead of a fresh TCP+TLS handshake per request
+    http_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300))
+    # Created here so it belongs to the server's running loop
+    poll_wakeup = asyncio.Event()
+    poller_task = asyncio.create_task(global_poller(http_session))
+
+@app.on_event("shutdown")
+async def stop_global_poller():
+    if poller_task:
+        poller_task.cancel()
+        try:
+            await poller_task
+        except asyncio.CancelledError:
+            pass
+    if http_session:
+        await http_session.close()
+
 @sio.event
 async def connect(sid, environ):
     logger.info(f"Web Client connected: {sid}")
@@ -42,7 +215,7 @@ async def join_game(sid, data):
     if ':' in server_ip:
         host, port_str = server_ip.split(':')
         # Clean port string (remove potential invisible chars)
-        port = int(''.join(filter(str.isdigit, port_str)))
+        port = int(NON_DIGIT_RE.sub('', port_str))
     else:
         host = server_ip
         port = 27015
@@ -53,53 +226,8 @@ async def join_game(sid, data):
     async def on_back_msg(user, text, type):
         await sio.emit('chat_message', {'user': user, 'text': text, 'type': type}, room=sid)
 
-    # Use CS16ServerParser for robust player list fetching
-    # We will run this in a separate async loop inside app.py instead of GoldSrcClient
-    # logic: app.py handles A2S queries (stateless/UDP), GoldSrcClient handles Game Connection (Stateful)
-    
-    parser = CS16ServerParser(timeout=2)
-    
-    async def poll_players_task(target_host, target_port, target_sid):
-        logger.info(f"Starting separate poller for {target_host}:{target_port}")
-        while target_sid in clients:
-            try:
-                # Run blocking parser in thread executor
-                data = await asyncio.to_thread(parser.query_server_full, target_host, target_port)
-                
-                # Debug logging
-                if data:
-                    logger.info(f"Parser Data: {data.keys()}")
-                    if 'players_list' in data:
-                        logger.info(f"Found {len(data['players_list'])} players in parser data")
-                    else:
-                         logger.warning("No 'players_list' key in data")
-                else:
-                    logger.warning("Parser returned None")
-                
-                if data:
-                    # Send basic info (Name, Map)
-                    if 'name' in data:
-                        await sio.emit('server_info', data, room=target_sid)
-
-                    if 'players_list' in data:
-                        players = data['players_list']
-                        # Normalize keys for frontend
-                        frontend_players = []
-                        for p in players:
-                             # cs16_parser returns: name, score, time_formatted
-                             frontend_players.append({
-                                 "name": p.get('name', 'Unknown'), 
-                                 "score": p.get('score', 0), 
-                                 "time": 0 # Time is formatted string in parser, we can parse or ignore
-                             })
-                        
-                        await sio.emit('player_list_update', frontend_players, room=target_sid)
-                        # Log to frontend console
-                        await sio.emit('chat_message', {'user': 'System', 'text': f"Updated {len(players)} players from {target_host}", 'type': 'console'}, room=target_sid)
-            except Exception as e:
-                logger.error(f"Poll task error: {e}")
-            
-            await asyncio.sleep(5)
+    # A repeated join replaces the previous game client and its subscription
+    release_client(sid)
 
     gs_client = GoldSrcClient(host, port, nickname, on_chat_message=on_back_msg)
     clients[sid] = gs_client
@@ -107,8 +235,12 @@ async def join_game(sid, data):
     # Start connection in background
     asyncio.create_task(gs_client.connect())
     
-    # Start Poller
-    asyncio.create_task(poll_players_task(host, port, sid))
+    # Subscribe to the global poller
+    target = (host, port)
+    targets.setdefault(target, set()).add(sid)
+    info_due.add(target)
+    if poll_wakeup:
+        poll_wakeup.set()
     
     await sio.emit('chat_message', {'user': 'System', 'text': f'Connecting to {host}:{port}...', 'type': 'system'}, room=sid)
 
@@ -125,9 +257,7 @@ async def chat_message(sid, msg):
 @sio.event
 async def disconnect(sid):
     logger.info(f"Web Client disconnected: {sid}")
-    if sid in clients:
-        clients[sid].close()
-        del clients[sid]
+    release_client(sid)
 
 if __name__ == "__main__":
     uvicorn.run(socket_app, host="0.0.0.0", port=8000, ssl_keyfile="key.pem", ssl_certfile="cert.pem")
@@ -4,10 +4,13 @@ CS 1.6 Server Statistics Parser v3.0
 Парсинг через WebAPI, RCON и прямой анализ протокола
 """
 
+import asyncio
 import socket
 import struct
 import json
+import logging
 import csv
+import io
 import re
 import urllib.request
 import urllib.error
@@ -15,6 +18,26 @@ from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp  # Нужен только для асинхронных HTTP запросов (CS16AsyncParser)
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson  # Быстрый JSON для save_json, без него - стандартный json
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger("cs16_parser")
+
+# Игрок из A2S_PLAYER: (имя, счёт, время в игре в секундах)
+PlayerRow = Tuple[str, int, float]
+
+# Строки и ячейки HTML таблицы игроков (_parse_html_players)
+_TR_RE = re.compile(r'<tr[^>]*>(.*?)</tr>', re.DOTALL | re.IGNORECASE)
+_TD_RE = re.compile(r'<td[^>]*>([^<]*)</td>', re.IGNORECASE)
 
 class CS16ServerParser:
     """Parser for CS 1.6 server info via multiple methods"""
@@ -23,6 +46,11 @@ class CS16ServerParser:
     A2S_INFO = b'\xFF\xFF\xFF\xFFTSource Engine Query\x00'
     A2S_PLAYER = b'\xFF\xFF\xFF\xFFU'
     A2S_RULES = b'\xFF\xFF\xFF\xFFV'
+    _CHALLENGE_REQ = b'\xFF\xFF\xFF\xFF\x55\xFF\xFF\xFF\xFF'
+    _OLD_CHALLENGE_REQ = b'\xFF\xFF\xFF\xFF\x57'
+    
+    # Хвост записи игрока в A2S_PLAYER: score (int32) + duration (float32)
+    _SCORE_TIME = struct.Struct('<if')
     
     # Популярные игровые моды и серверные утилиты с API
     API_ENDPOINTS = {
@@ -30,21 +58,140 @@ class CS16ServerParser:
         'masterclan': 'https://www.masterclan.info/api/servers'
     }
     
+    # Название/карта меняются редко - A2S_INFO кешируем на это время (сек)
+    INFO_CACHE_TTL = 30
+    
+    # Challenge сервера переиспользуется между опросами (сек)
+    CHALLENGE_TTL = 30
+    
+    # Максимум потоков для query_known_servers
+    MAX_WORKERS = 16
+    
+    # Способы получения списка игроков. HTTP (api/web) медленные - только по запросу
+    DEFAULT_PLAYER_METHODS = ('a2s',)
+    ALL_PLAYER_METHODS = ('a2s', 'api', 'web')
+    
     def __init__(self, timeout: int = 5):
         self.timeout = timeout
         self.servers = []
         self.lock = threading.Lock()
+        self._info_cache: Dict[Tuple[str, int], Tuple[float, Dict]] = {}
+        self._challenges: Dict[Tuple[str, int], Tuple[bytes, float]] = {}
+        # UDP сокет переиспользуется между запросами (свой на каждый поток)
+        self._local = threading.local()
+        self._sockets: List[socket.socket] = []
+    
+    def _get_socket(self) -> socket.socket:
+        """
+        Долгоживущий UDP сокет текущего потока (создаётся лениво)
+        """
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.settimeout(self.timeout)
+            self._local.sock = sock
+            with self.lock:
+                self._sockets.append(sock)
+        return sock
+    
+    def _player_query(self, challenge: bytes) -> bytearray:
+        """
+        A2S_PLAYER + challenge в предвыделенном буфере потока (перезаписываются только байты 5:9)
+        """
+        packet = getattr(self._local, 'player_query', None)
+        if packet is None:
+            packet = bytearray(self.A2S_PLAYER + b'\xFF\xFF\xFF\xFF')
+            self._local.player_query = packet
+        packet[5:9] = challenge
+        return packet
+    
+    def _cached_challenge(self, key: Tuple[str, int]) -> Optional[bytes]:
+        """Challenge из кеша, если он ещё не истёк"""
+        cached = self._challenges.get(key)
+        if cached:
+            if time.monotonic() < cached[1]:
+                return cached[0]
+            del self._challenges[key]
+        return None
+    
+    def _store_challenge(self, key: Tuple[str, int], challenge: bytes):
+        self._challenges[key] = (challenge, time.monotonic() + self.CHALLENGE_TTL)
+    
+    def _cached_info(self, host: str, port: int) -> Optional[Dict]:
+        """Копия A2S_INFO из кеша, если он моложе INFO_CACHE_TTL"""
+        cached = self._info_cache.get((host, port))
+        if cached:
+            if time.monotonic() - cached[0] < self.INFO_CACHE_TTL:
+                return dict(cached[1])
+            del self._info_cache[(host, port)]
+        return None
+    
+    def forget(self, host: str, port: int):
+        """
+        Удаление кешей сервера, который больше не опрашивается
+        (иначе долгоживущий парсер копит записи для всех когда-либо запрошенных адресов)
+        """
+        self._info_cache.pop((host, port), None)
+        self._challenges.pop((host, port), None)
+    
+    def _drain_socket(self, sock: socket.socket):
+        """
+        Выбрасывает запоздавшие ответы от прошлых запросов (после таймаута)
+        """
+        sock.settimeout(0)
+        try:
+            while True:
+                sock.recvfrom(4096)
+        except OSError:
+            pass
+        finally:
+            sock.settimeout(self.timeout)
+    
+    def _recv_reply(self, sock: socket.socket, addr: Tuple[str, int]) -> bytes:
+        """
+        Ответ именно от addr: сокет общий для всех серверов потока, поэтому запоздавшие
+        ответы других серверов пропускаются. Общий срок ожидания - self.timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                response, sender = sock.recvfrom(4096)
+                if sender[:2] == addr:
+                    return response
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout()
+                sock.settimeout(remaining)
+        finally:
+            sock.settimeout(self.timeout)
+    
+    def close(self):
+        """Закрытие всех UDP сокетов парсера"""
+        with self.lock:
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local = threading.local()
         
-    def query_server_full(self, host: str, port: int) -> Optional[Dict]:
+    def query_server_full(self, host: str, port: int,
+                          methods: Tuple[str, ...] = DEFAULT_PLAYER_METHODS) -> Optional[Dict]:
         """
         Полный запрос информации о сервере (INFO + PLAYERS)
+        INFO берётся из кеша, если он моложе INFO_CACHE_TTL
         """
-        server_info = self.query_server_info(host, port)
-        if not server_info:
-            return None
+        server_info = self._cached_info(host, port)
+        if server_info is None:
+            server_info = self.query_server_info(host, port)
+            if not server_info:
+                return None
+            self._info_cache[(host, port)] = (time.monotonic(), dict(server_info))
         
         # Получаем список игроков несколькими способами
-        players = self.query_server_players_advanced(host, port)
+        players = self.query_server_players_advanced(host, port, methods)
         server_info['players_list'] = players
         server_info['online_players'] = len(players)
         
@@ -55,18 +202,18 @@ class CS16ServerParser:
         A2S_INFO запрос - информация о сервере (название, карта, игроки)
         """
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.settimeout(self.timeout)
+            sock = self._get_socket()
+            self._drain_socket(sock)
             
-            sock.sendto(self.A2S_INFO, (host, port))
-            response, _ = sock.recvfrom(4096)
-            sock.close()
+            addr = (socket.gethostbyname(host), port)
+            sock.sendto(self.A2S_INFO, addr)
+            response = self._recv_reply(sock, addr)
             
             if len(response) < 6 or response[:4] != b'\xFF\xFF\xFF\xFF':
                 return None
             
-            # DEBUG: Log raw A2S_INFO response
-            print(f"DEBUG RAW A2S_INFO ({len(response)} bytes): {response.hex()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("RAW A2S_INFO %d bytes: %s", len(response), response[:64].hex())
             
             return self._parse_a2s_info(response, host, port)
                 
@@ -93,6 +240,7 @@ class CS16ServerParser:
             protocol = response[offset]
             offset += 1
             
+            # find() ищет только до следующего NUL - дешевле, чем заранее собирать позиции всех NUL
             def read_string(data: bytes, pos: int) -> Tuple[str, int]:
                 end = data.find(b'\x00', pos)
                 if end == -1:
@@ -196,28 +344,31 @@ class CS16ServerParser:
         except Exception as e:
             return None
     
-    def query_server_players_advanced(self, host: str, port: int) -> List[Dict]:
+    def query_server_players_advanced(self, host: str, port: int,
+                                      methods: Tuple[str, ...] = DEFAULT_PLAYER_METHODS) -> List[Dict]:
         """
-        Продвинутый запрос игроков - несколько методов
-        1. A2S_PLAYER (оригинальный)
-        2. GameTracker API
-        3. MasterClan API
-        4. Прямой TCP подключение (рискованно)
+        Продвинутый запрос игроков - несколько методов (из methods)
+        1. 'a2s' - A2S_PLAYER (оригинальный)
+        2. 'api' - GameTracker API
+        3. 'web' - встроенный web-интерфейс сервера
         """
         # Метод 1: A2S_PLAYER
-        players = self.query_server_players_a2s(host, port)
-        if players:
-            return players
+        if 'a2s' in methods:
+            players = self.query_server_players_a2s(host, port)
+            if players:
+                return players
         
         # Метод 2: API сервисов
-        players = self.query_server_players_api(host, port)
-        if players:
-            return players
+        if 'api' in methods:
+            players = self.query_server_players_api(host, port)
+            if players:
+                return players
         
         # Метод 3: WebAPI (если доступен)
-        players = self.query_server_players_web(host, port)
-        if players:
-            return players
+        if 'web' in methods:
+            players = self.query_server_players_web(host, port)
+            if players:
+                return players
         
         return []
     
@@ -226,119 +377,143 @@ class CS16ServerParser:
         A2S_PLAYER запрос с улучшенной обработкой (попытка двух методов challenge)
         """
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.settimeout(self.timeout)
+            sock = self._get_socket()
+            self._drain_socket(sock)
             
             # Strategy:
+            # 0. Reuse a cached challenge from a previous poll (skips one round trip)
             # 1. Try to get Challenge using 0x55 with -1 (Standard)
             # 2. Try to get Challenge using 0x57 (Old)
             # 3. If we get a challenge, send the actual query
             
-            challenge = None
+            key = (host, port)
+            challenge = self._cached_challenge(key)
+            addr = (socket.gethostbyname(host), port)
             
             # Attempt 1: Standard A2S_PLAYER challenge request
-            try:
-                # Send 0xFFFFFFFF 0x55 0xFFFFFFFF (Request Challenge)
-                sock.sendto(b'\xFF\xFF\xFF\xFF\x55\xFF\xFF\xFF\xFF', (host, port))
-                response, _ = sock.recvfrom(4096)
-                print(f"DEBUG RAW PLAYER RESP 1 ({len(response)} bytes): {response.hex()}")
-                
-                # Check for S2C_CHALLENGE (0x41)
-                if len(response) >= 5 and response[:4] == b'\xFF\xFF\xFF\xFF' and response[4] == 0x41:
-                    challenge = response[5:9]
-            except socket.timeout:
-                print("DEBUG: Method 1 Timeout")
-                pass
+            if not challenge:
+                try:
+                    # Send 0xFFFFFFFF 0x55 0xFFFFFFFF (Request Challenge)
+                    sock.sendto(self._CHALLENGE_REQ, addr)
+                    response = self._recv_reply(sock, addr)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("RAW PLAYER RESP 1 %d bytes: %s", len(response), response[:64].hex())
+                    
+                    # Check for S2C_CHALLENGE (0x41)
+                    if len(response) >= 5 and response[:4] == b'\xFF\xFF\xFF\xFF' and response[4] == 0x41:
+                        challenge = response[5:9]
+                except socket.timeout:
+                    logger.debug("Method 1 Timeout")
+                    pass
             
             # Attempt 2: Old "Get Challenge" 0x57
             if not challenge:
                 try:
-                    sock.sendto(b'\xFF\xFF\xFF\xFF\x57', (host, port))
-                    response, _ = sock.recvfrom(4096)
-                    print(f"DEBUG RAW PLAYER RESP 2 ({len(response)} bytes): {response.hex()}")
+                    sock.sendto(self._OLD_CHALLENGE_REQ, addr)
+                    response = self._recv_reply(sock, addr)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("RAW PLAYER RESP 2 %d bytes: %s", len(response), response[:64].hex())
                     
                     if len(response) >= 5 and response[:4] == b'\xFF\xFF\xFF\xFF' and response[4] == 0x41:
                          challenge = response[5:9]
                 except socket.timeout:
-                    print("DEBUG: Method 2 Timeout")
+                    logger.debug("Method 2 Timeout")
                     pass
 
             if challenge:
-                print(f"DEBUG: Got Challenge {challenge.hex()}, sending query...")
-                # Send Query with Challenge
-                sock.sendto(self.A2S_PLAYER + challenge, (host, port))
-                try:
-                    response, _ = sock.recvfrom(4096)
-                    print(f"DEBUG RAW FINAL RESP ({len(response)} bytes): {response.hex()}")
+                # Send Query with Challenge. A stale challenge is answered with a new S2C_CHALLENGE - retry once with it
+                for attempt in range(2):
+                    logger.debug("Got Challenge %s, sending query...", challenge.hex())
+                    sock.sendto(self._player_query(challenge), addr)
+                    try:
+                        response = self._recv_reply(sock, addr)
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("RAW FINAL RESP %d bytes: %s", len(response), response[:64].hex())
+                    except socket.timeout:
+                        logger.debug("Final Query Timeout")
+                        self._challenges.pop(key, None)
+                        break
+                    
+                    if len(response) < 5 or response[:4] != b'\xFF\xFF\xFF\xFF':
+                        break
+                    
+                    if response[4] == 0x41 and len(response) >= 9:
+                        challenge = response[5:9]
+                        continue
                     
                     # Accept both 0x55 ('U') and 0x44 ('D')
-                    if len(response) >= 5 and response[:4] == b'\xFF\xFF\xFF\xFF' and (response[4] == 0x55 or response[4] == 0x44):
-                        return self._parse_a2s_players(response)
-                except socket.timeout:
-                     print("DEBUG: Final Query Timeout")
+                    if response[4] == 0x55 or response[4] == 0x44:
+                        self._store_challenge(key, challenge)
+                        return self._player_dicts(self._parse_a2s_players(response))
+                    break
             else:
-                 print("DEBUG: Failed to get challenge")
+                 logger.debug("Failed to get challenge")
 
-            sock.close()
             return []
         except Exception as e:
-            print(f"Error querying players: {e}")
+            logger.error("Error querying players: %s", e)
             return []
     
-    def _parse_a2s_players(self, response: bytes) -> List[Dict]:
+    def _parse_a2s_players(self, response: bytes) -> List[PlayerRow]:
         """
-        Парсинг A2S_PLAYER ответа
+        Парсинг A2S_PLAYER ответа в кортежи (имя, счёт, время)
         """
-        try:
-            players = []
+        players = []
+        size = len(response)
+        
+        # заголовок (4) + тип (1) + количество игроков (1); дальше все чтения проверяют границы
+        if size < 6:
+            return []
+        
+        # 0x55 (Source/Modern) or 0x44 (GoldSrc/Legacy)
+        if response[4] != 0x55 and response[4] != 0x44:
+            return []
+        
+        player_count = response[5]
+        offset = 6
+        
+        # memoryview - имена декодируются без промежуточных срезов bytes
+        mv = memoryview(response)
+        # методы, вызываемые на каждого игрока, связываются один раз
+        find = response.find
+        unpack_from = self._SCORE_TIME.unpack_from
+        append = players.append
+        
+        for i in range(player_count):
+            if offset >= size:
+                break
             
-            # 0x55 (Source/Modern) or 0x44 (GoldSrc/Legacy)
-            if response[4] != 0x55 and response[4] != 0x44:
-                return []
+            offset += 1 # index (в GoldSrc всегда 0)
             
-            offset = 5
+            end = find(b'\x00', offset)
+            if end == -1:
+                break
             
-            if offset >= len(response):
-                return []
+            name = str(mv[offset:end], 'utf-8', 'ignore')
+            offset = end + 1
             
-            player_count = response[offset]
-            offset += 1
+            if offset + 8 > size:
+                break
             
-            for i in range(player_count):
-                if offset >= len(response):
-                    break
-                
-                index = response[offset]
-                offset += 1
-                
-                end = response.find(b'\x00', offset)
-                if end == -1:
-                    break
-                
-                name = response[offset:end].decode('utf-8', errors='ignore')
-                offset = end + 1
-                
-                if offset + 8 > len(response):
-                    break
-                
-                score = struct.unpack('<i', response[offset:offset+4])[0]
-                offset += 4
-                
-                time_played = struct.unpack('<f', response[offset:offset+4])[0]
-                offset += 4
-                
-                players.append({
-                    'index': index,
-                    'name': name,
-                    'score': score,
-                    'time_seconds': round(time_played, 1),
-                    'time_formatted': self._format_time(time_played),
-                    'source': 'A2S'
-                })
-            
-            return players
-        except:
-            return []
+            score, time_played = unpack_from(response, offset)
+            offset += 8
+            
+            append((name, score, time_played))
+        
+        return players
+    
+    def _player_dicts(self, players: List[PlayerRow]) -> List[Dict]:
+        """
+        Кортежи игроков A2S -> словари для отчётов (JSON/CSV/статистика)
+        """
+        return [{
+            'index': index,
+            'name': name,
+            'score': score,
+            'time_seconds': round(time_played, 1),
+            'time_formatted': self._format_time(time_played),
+            'source': 'A2S'
+        } for index, (name, score, time_played) in enumerate(players)]
     
     def query_server_players_api(self, host: str, port: int) -> List[Dict]:
         """
@@ -346,57 +521,49 @@ class CS16ServerParser:
         """
         try:
             # GameTracker API
-            url = f"https://api.gametracker.com/api/v2/servers/csgo/{host}:{port}/players"
-            req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+            req = urllib.request.Request(self._api_players_url(host, port), headers={'User-Agent': 'Mozilla/5.0'})
             response = urllib.request.urlopen(req, timeout=self.timeout)
             data = json.loads(response.read().decode())
             
-            if 'players' in data:
-                players = []
-                for player in data['players']:
-                    players.append({
-                        'name': player.get('name', 'Unknown'),
-                        'score': player.get('score', 0),
-                        'time_seconds': player.get('time', 0),
-                        'time_formatted': self._format_time(player.get('time', 0)),
-                        'source': 'GameTracker'
-                    })
-                return players
+            return self._parse_api_players(data)
         except:
             pass
         
         return []
     
+    def _api_players_url(self, host: str, port: int) -> str:
+        return f"https://api.gametracker.com/api/v2/servers/csgo/{host}:{port}/players"
+    
+    def _parse_api_players(self, data: Dict) -> List[Dict]:
+        """
+        Парсинг ответа GameTracker API
+        """
+        if 'players' not in data:
+            return []
+        
+        players = []
+        for player in data['players']:
+            players.append({
+                'name': player.get('name', 'Unknown'),
+                'score': player.get('score', 0),
+                'time_seconds': player.get('time', 0),
+                'time_formatted': self._format_time(player.get('time', 0)),
+                'source': 'GameTracker'
+            })
+        return players
+    
     def query_server_players_web(self, host: str, port: int) -> List[Dict]:
         """
         Попытка получить данные со встроенного web-интерфейса сервера
         """
         try:
-            urls = [
-                f"http://{host}:{port}/api/players",
-                f"http://{host}:27005/api/players",
-                f"http://{host}:8080/players",
-                f"http://{host}:80/admin/players.html"
-            ]
-            
-            for url in urls:
+            for url in self._web_players_urls(host, port):
                 try:
                     req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
                     response = urllib.request.urlopen(req, timeout=2)
-                    data = response.read().decode()
-                    
-                    # Парсим JSON если это API
-                    try:
-                        json_data = json.loads(data)
-                        if isinstance(json_data, list):
-                            return json_data
-                        elif 'players' in json_data:
-                            return json_data['players']
-                    except:
-                        # Парсим HTML таблицу
-                        players = self._parse_html_players(data)
-                        if players:
-                            return players
+                    players = self._parse_web_players(response.read().decode())
+                    if players is not None:
+                        return players
                 except:
                     continue
         except:
@@ -404,6 +571,34 @@ class CS16ServerParser:
         
         return []
     
+    def _web_players_urls(self, host: str, port: int) -> List[str]:
+        return [
+            f"http://{host}:{port}/api/players",
+            f"http://{host}:27005/api/players",
+            f"http://{host}:8080/players",
+            f"http://{host}:80/admin/players.html"
+        ]
+    
+    def _parse_web_players(self, data: str) -> Optional[List[Dict]]:
+        """
+        Парсинг ответа web-интерфейса (JSON API или HTML таблица).
+        None - в ответе нет игроков, стоит попробовать следующий URL
+        """
+        # Парсим JSON если это API
+        try:
+            json_data = json.loads(data)
+            if isinstance(json_data, list):
+                return json_data
+            elif 'players' in json_data:
+                return json_data['players']
+        except:
+            # Парсим HTML таблицу
+            players = self._parse_html_players(data)
+            if players:
+                return players
+        
+        return None
+    
     def _parse_html_players(self, html: str) -> List[Dict]:
         """
         Парсинг HTML таблицы игроков (для встроенного interface)
@@ -411,11 +606,9 @@ class CS16ServerParser:
         try:
             players = []
             
-            # Поиск строк таблицы с информацией об игроках
-            rows = re.findall(r'<tr[^>]*>.*?</tr>', html, re.DOTALL)
-            
-            for row in rows:
-                cells = re.findall(r'<td[^>]*>([^<]*)</td>', row)
+            # Поиск строк таблицы с информацией об игроках (один проход по странице)
+            for row in _TR_RE.finditer(html):
+                cells = _TD_RE.findall(row.group(1))
                 
                 if len(cells) >= 3:
                     name = cells[0].strip()
@@ -448,7 +641,8 @@ class CS16ServerParser:
             return f"{minutes}:{secs:02d}"
     
     def query_known_servers(self, servers_list: List[Tuple[str, int]], 
-                           use_threading: bool = True) -> List[Dict]:
+                           use_threading: bool = True,
+                           methods: Tuple[str, ...] = DEFAULT_PLAYER_METHODS) -> List[Dict]:
         """
         Запрос информации с известных серверов
         """
@@ -456,29 +650,20 @@ class CS16ServerParser:
         total = len(servers_list)
         
         if use_threading and total > 1:
-            threads = []
-            
-            def worker(host, port, idx):
-                print(f"[{idx}/{total}] {host}:{port}...", end=" ", flush=True)
-                server_info = self.query_server_full(host, port)
-                if server_info:
-                    print(f"✓ ({server_info.get('players', 0)} игроков)")
-                    with self.lock:
+            # Запросы упираются в UDP I/O - небольшого пула хватает
+            with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, total)) as executor:
+                infos = executor.map(lambda hp: self.query_server_full(*hp, methods), servers_list)
+                for idx, ((host, port), server_info) in enumerate(zip(servers_list, infos), 1):
+                    print(f"[{idx}/{total}] {host}:{port}...", end=" ", flush=True)
+                    if server_info:
+                        print(f"✓ ({server_info.get('players', 0)} игроков)")
                         results.append(server_info)
-                else:
-                    print("✗")
-            
-            for idx, (host, port) in enumerate(servers_list, 1):
-                t = threading.Thread(target=worker, args=(host, port, idx))
-                threads.append(t)
-                t.start()
-            
-            for t in threads:
-                t.join()
+                    else:
+                        print("✗")
         else:
             for idx, (host, port) in enumerate(servers_list, 1):
                 print(f"[{idx}/{total}] {host}:{port}...", end=" ", flush=True)
-                server_info = self.query_server_full(host, port)
+                server_info = self.query_server_full(host, port, methods)
                 if server_info:
                     print(f"✓ ({server_info.get('players', 0)} игроков)")
                     results.append(server_info)
@@ -491,8 +676,13 @@ class CS16ServerParser:
     
     def save_json(self, data: List[Dict], filename: str = 'cs16_servers.json'):
         """Сохранение результатов в JSON"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            blob = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        else:
+            blob = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+        
+        with open(filename, 'wb') as f:
+            f.write(blob)
         print(f"✓ Сохранено в {filename}")
     
     def save_csv(self, data: List[Dict], filename: str = 'cs16_servers.csv'):
@@ -500,52 +690,71 @@ class CS16ServerParser:
         if not data:
             return
         
+        # Строки собираются в памяти и пишутся в файл одним write
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(['IP', 'Port', 'Сервер', 'Карта', 'Игроки', 'Макс', 'Боты', 'Свобод', 'Время запроса'])
+        
+        for server in data:
+            writer.writerow([
+                server.get('host', ''),
+                server.get('port', ''),
+                server.get('name', '')[:30],
+                server.get('map', ''),
+                server.get('players', 0),
+                server.get('max_players', 0),
+                server.get('bots', 0),
+                server.get('free_slots', 0),
+                server.get('timestamp', '')
+            ])
+        
         with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['IP', 'Port', 'Сервер', 'Карта', 'Игроки', 'Макс', 'Боты', 'Свобод', 'Время запроса'])
-            
-            for server in data:
-                writer.writerow([
-                    server.get('host', ''),
-                    server.get('port', ''),
-                    server.get('name', '')[:30],
-                    server.get('map', ''),
-                    server.get('players', 0),
-                    server.get('max_players', 0),
-                    server.get('bots', 0),
-                    server.get('free_slots', 0),
-                    server.get('timestamp', '')
-                ])
+            f.write(buf.getvalue())
         
         print(f"✓ Сохранено в {filename}")
     
     def save_players_csv(self, data: List[Dict], filename: str = 'cs16_players.csv'):
         """Сохранение списка игроков в CSV"""
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['IP:Port', 'Сервер', 'Игрок', 'Счёт', 'Время игры', 'Источник', 'Время запроса'])
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(['IP:Port', 'Сервер', 'Игрок', 'Счёт', 'Время игры', 'Источник', 'Время запроса'])
+        
+        for server in data:
+            server_addr = f"{server.get('host')}:{server.get('port')}"
+            server_name = server.get('name', '')[:20]
             
-            for server in data:
-                server_addr = f"{server.get('host')}:{server.get('port')}"
-                server_name = server.get('name', '')[:20]
-                
-                players_list = server.get('players_list', [])
-                if players_list:
-                    for player in players_list:
-                        writer.writerow([
-                            server_addr,
-                            server_name,
-                            player.get('name', '')[:30],
-                            player.get('score', 0),
-                            player.get('time_formatted', 'N/A'),
-                            player.get('source', 'Unknown'),
-                            server.get('timestamp', '')
-                        ])
-                else:
-                    writer.writerow([server_addr, server_name, '-', '-', '-', 'None', server.get('timestamp', '')])
+            players_list = server.get('players_list', [])
+            if players_list:
+                for player in players_list:
+                    writer.writerow([
+                        server_addr,
+                        server_name,
+                        player.get('name', '')[:30],
+                        player.get('score', 0),
+                        player.get('time_formatted', 'N/A'),
+                        player.get('source', 'Unknown'),
+                        server.get('timestamp', '')
+                    ])
+            else:
+                writer.writerow([server_addr, server_name, '-', '-', '-', 'None', server.get('timestamp', '')])
+        
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            f.write(buf.getvalue())
         
         print(f"✓ Сохранено в {filename}")
     
+    async def save_json_async(self, data: List[Dict], filename: str = 'cs16_servers.json'):
+        """save_json в фоновом потоке (не блокирует event loop)"""
+        await asyncio.to_thread(self.save_json, data, filename)
+    
+    async def save_csv_async(self, data: List[Dict], filename: str = 'cs16_servers.csv'):
+        """save_csv в фоновом потоке"""
+        await asyncio.to_thread(self.save_csv, data, filename)
+    
+    async def save_players_csv_async(self, data: List[Dict], filename: str = 'cs16_players.csv'):
+        """save_players_csv в фоновом потоке"""
+        await asyncio.to_thread(self.save_players_csv, data, filename)
+    
     def print_stats(self, data: List[Dict]):
         """Вывод статистики"""
         print("\n" + "="*90)
@@ -572,6 +781,264 @@ class CS16ServerParser:
             print(f"   Запрос: {server.get('timestamp', 'N/A')}")
 
 
+class _A2SProtocol(asyncio.DatagramProtocol):
+    """
+    UDP протокол для асинхронных A2S запросов.
+    Ответы раздаются ожидающим Future по адресу отправителя и типу ответа,
+    поэтому к одному серверу может одновременно идти INFO и PLAYER обмен.
+    """
+    
+    # Заголовок ответа (5-й байт) -> тип ожидаемого ответа
+    RESPONSE_KINDS = {
+        0x49: 'info',       # S2A_INFO
+        0x41: 'challenge',  # S2C_CHALLENGE
+        0x44: 'players',    # S2A_PLAYER (GoldSrc)
+        0x55: 'players',    # S2A_PLAYER (Source)
+    }
+    
+    def __init__(self):
+        self.transport = None
+        self.waiters: Dict[Tuple[Tuple[str, int], str], asyncio.Future] = {}
+    
+    def connection_made(self, transport):
+        self.transport = transport
+    
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < 5:
+            return
+        waiter = self.waiters.get((addr[:2], self.RESPONSE_KINDS.get(data[4])))
+        if waiter and not waiter.done():
+            waiter.set_result(data)
+    
+    def error_received(self, exc: Exception):
+        # ICMP "port unreachable" и т.п. (на Windows - WSAECONNRESET) приходит без адреса:
+        # неизвестно, к какому серверу он относится, поэтому ожидающие не трогаются -
+        # каждый завершится по своему таймауту
+        logger.debug("A2S socket error: %s", exc)
+    
+    def connection_lost(self, exc: Optional[Exception]):
+        for waiter in self.waiters.values():
+            if not waiter.done():
+                waiter.cancel()
+
+
+class CS16AsyncParser(CS16ServerParser):
+    """
+    Асинхронный A2S парсер на asyncio datagram endpoint (без потоков).
+    Парсинг ответов общий с CS16ServerParser.
+    """
+    
+    # IP сервера переиспользуется между опросами (сек), затем резолвится заново
+    RESOLVE_TTL = 60
+    
+    def __init__(self, timeout: int = 5):
+        super().__init__(timeout)
+        self._protocol: Optional[_A2SProtocol] = None
+        self._endpoint_lock = asyncio.Lock()
+        self._addr_locks: Dict[Tuple[Tuple[str, int], str], asyncio.Lock] = {}
+        self._resolved: Dict[str, Tuple[str, float]] = {}
+        # Одновременные одинаковые запросы к одному серверу схлопываются в один обмен
+        self._inflight: Dict[Tuple[str, str, int], asyncio.Future] = {}
+    
+    async def _coalesce(self, key: Tuple[str, str, int], factory):
+        """
+        Ждёт уже идущий запрос с тем же ключом или запускает новый
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield - отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(task)
+    
+    async def _get_protocol(self) -> _A2SProtocol:
+        async with self._endpoint_lock:
+            if self._protocol is None or self._protocol.transport.is_closing():
+                loop = asyncio.get_running_loop()
+                _, self._protocol = await loop.create_datagram_endpoint(
+                    _A2SProtocol, local_addr=('0.0.0.0', 0))
+            return self._protocol
+    
+    async def _resolve(self, host: str, port: int) -> Tuple[str, int]:
+        """
+        IP сервера из кеша (не старше RESOLVE_TTL), иначе - новый getaddrinfo
+        """
+        cached = self._resolved.get(host)
+        if cached and time.monotonic() < cached[1]:
+            return cached[0], port
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        ip = infos[0][4][0]
+        self._resolved[host] = (ip, time.monotonic() + self.RESOLVE_TTL)
+        return ip, port
+    
+    def forget(self, host: str, port: int):
+        """
+        Удаление кешей сервера, включая записи по его IP (challenge, блокировки обменов)
+        """
+        super().forget(host, port)
+        cached = self._resolved.pop(host, None)
+        if cached is None:
+            return
+        addr = (cached[0], port)
+        self._challenges.pop(addr, None)
+        for kind in ('info', 'players'):
+            lock = self._addr_locks.get((addr, kind))
+            # занятая блокировка остаётся у идущего обмена
+            if lock is not None and not lock.locked():
+                del self._addr_locks[(addr, kind)]
+    
+    async def _request(self, protocol: _A2SProtocol, addr: Tuple[str, int], packet: bytes, *kinds: str) -> Optional[bytes]:
+        """
+        Отправка пакета и ожидание от addr ответа одного из типов kinds (None при таймауте)
+        """
+        keys = [(addr, kind) for kind in kinds]
+        waiter = asyncio.get_running_loop().create_future()
+        for key in keys:
+            protocol.waiters[key] = waiter
+        try:
+            protocol.transport.sendto(packet, addr)
+            return await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            for key in keys:
+                if protocol.waiters.get(key) is waiter:
+                    del protocol.waiters[key]
+    
+    async def query_info(self, host: str, port: int) -> Optional[Dict]:
+        """
+        A2S_INFO запрос (асинхронный), ответ моложе INFO_CACHE_TTL берётся из кеша
+        """
+        info = self._cached_info(host, port)
+        if info is not None:
+            return info
+        return await self._coalesce(('info', host, port), lambda: self._query_info(host, port))
+    
+    async def _query_info(self, host: str, port: int) -> Optional[Dict]:
+        try:
+            addr = await self._resolve(host, port)
+            protocol = await self._get_protocol()
+            async with self._addr_locks.setdefault((addr, 'info'), asyncio.Lock()):
+                response = await self._request(protocol, addr, self.A2S_INFO, 'info')
+        except OSError:
+            return None
+        
+        if response is None:
+            # Сервер не ответил - возможно, сменился IP: следующий запрос резолвит заново
+            self._resolved.pop(host, None)
+            return None
+        
+        if len(response) < 6 or response[:4] != b'\xFF\xFF\xFF\xFF':
+            return None
+        
+        info = self._parse_a2s_info(response, host, port)
+        if info:
+            self._info_cache[(host, port)] = (time.monotonic(), dict(info))
+        return info
+    
+    async def query_players(self, host: str, port: int) -> Optional[List[PlayerRow]]:
+        """
+        A2S_PLAYER запрос (асинхронный): challenge (0x55, затем старый 0x57) + запрос.
+        None - сервер не ответил (в отличие от пустого списка игроков)
+        """
+        return await self._coalesce(('players', host, port), lambda: self._query_players(host, port))
+    
+    async def _query_players(self, host: str, port: int) -> Optional[List[PlayerRow]]:
+        try:
+            addr = await self._resolve(host, port)
+            protocol = await self._get_protocol()
+            async with self._addr_locks.setdefault((addr, 'players'), asyncio.Lock()):
+                challenge = self._cached_challenge(addr)
+                if not challenge:
+                    for request in (self._CHALLENGE_REQ, self._OLD_CHALLENGE_REQ):
+                        response = await self._request(protocol, addr, request, 'challenge')
+                        if response and len(response) >= 9 and response[:4] == b'\xFF\xFF\xFF\xFF' and response[4] == 0x41:
+                            challenge = response[5:9]
+                            break
+                
+                if not challenge:
+                    self._resolved.pop(host, None)
+                    return None
+                
+                # A stale challenge is answered with a new S2C_CHALLENGE - retry once with it
+                for attempt in range(2):
+                    response = await self._request(protocol, addr, self._player_query(challenge), 'players', 'challenge')
+                    if response is None:
+                        self._challenges.pop(addr, None)
+                        self._resolved.pop(host, None)
+                        return None
+                    if len(response) >= 9 and response[:4] == b'\xFF\xFF\xFF\xFF' and response[4] == 0x41:
+                        challenge = response[5:9]
+                        continue
+                    break
+        except OSError:
+            return None
+        
+        # Accept both 0x55 ('U') and 0x44 ('D')
+        if response and len(response) >= 5 and response[:4] == b'\xFF\xFF\xFF\xFF' and (response[4] == 0x55 or response[4] == 0x44):
+            self._store_challenge(addr, challenge)
+            return self._parse_a2s_players(response)
+        return None
+    
+    async def query_players_api(self, session: "aiohttp.ClientSession", host: str, port: int) -> List[Dict]:
+        """
+        Запрос через публичные API сервисы (асинхронный, keep-alive через общую сессию)
+        """
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with session.get(self._api_players_url(host, port), headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout) as response:
+                data = json.loads(await response.text())
+            return self._parse_api_players(data)
+        except Exception:
+            return []
+    
+    async def query_players_web(self, session: "aiohttp.ClientSession", host: str, port: int) -> List[Dict]:
+        """
+        Запрос к встроенному web-интерфейсу сервера (асинхронный)
+        """
+        timeout = aiohttp.ClientTimeout(total=2)
+        for url in self._web_players_urls(host, port):
+            try:
+                async with session.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout) as response:
+                    players = self._parse_web_players(await response.text())
+                if players is not None:
+                    return players
+            except Exception:
+                continue
+        
+        return []
+    
+    async def query_players_advanced(self, host: str, port: int,
+                                     session: Optional["aiohttp.ClientSession"] = None,
+                                     methods: Tuple[str, ...] = CS16ServerParser.DEFAULT_PLAYER_METHODS) -> Optional[List[PlayerRow]]:
+        """
+        A2S_PLAYER, затем (если разрешены в methods и передана HTTP сессия) API сервисов и web-интерфейс.
+        None - игроков не удалось получить ни одним способом
+        """
+        a2s_players = await self.query_players(host, port) if 'a2s' in methods else None
+        if a2s_players or session is None:
+            return a2s_players
+        
+        players = None
+        if 'api' in methods:
+            players = await self.query_players_api(session, host, port)
+        if not players and 'web' in methods:
+            players = await self.query_players_web(session, host, port)
+        if players:
+            return [(p.get('name', 'Unknown'), p.get('score', 0), p.get('time_seconds', 0)) for p in players]
+        
+        return a2s_players
+    
+    def close(self):
+        """Закрытие UDP endpoint и сокетов базового парсера"""
+        super().close()
+        if self._protocol is not None:
+            self._protocol.transport.close()
+            self._protocol = None
+
+
 # Основной блок
 if __name__ == "__main__":
     parser = CS16ServerParser(timeout=5)
@@ -589,7 +1056,9 @@ if __name__ == "__main__":
     print(f"\nЗапрос {len(known_servers)} серверов с расширенным парсингом...")
     print("(A2S Protocol + API + Web Interface)\n")
     
-    results = parser.query_known_servers(known_servers, use_threading=True)
+    results = parser.query_known_servers(known_servers, use_threading=True,
+                                          methods=CS16ServerParser.ALL_PLAYER_METHODS)
+    parser.close()
     
     parser.save_json(results, 'competitors_full.json')
     parser.save_csv(results, 'competitors_servers.csv')
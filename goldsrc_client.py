@@ -8,13 +8,71 @@ logger = logging.getLogger("GoldSrcClient")
 
 APP_ID = 10  # Counter-Strike 1.6
 PROTO_VERSION = 48
+RECV_BATCH = 32  # Max datagrams drained per readable wakeup
+RECV_BUF_SIZE = 4096  # >= GoldSrc MAX_UDP_PACKET (4010)
+MSG_QUEUE_SIZE = 256  # Pending chat callbacks, newer lines are dropped when full
+SOCK_RCVBUF = 1 << 20  # Kernel receive buffer, absorbs NetChan bursts
+SOCK_SNDBUF = 256 << 10  # Kernel send buffer
+TOS_EF = 0xB8  # DSCP Expedited Forwarding (voice)
+PROTO_VERSION_BYTES = str(PROTO_VERSION).encode('ascii')
+
+# Connectionless (OOB) packet prefix and the constant packets built on it
+OOB = b'\xff\xff\xff\xff'
+PKT_GETCHAL = OOB + b'getchallenge steam\n'
+PKT_CONNECT = OOB + b'connect '
+PKT_NEW = OOB + b'new'
+PKT_JOINTEAM1 = OOB + b'jointeam 1'
+PKT_JOINCLASS1 = OOB + b'joinclass 1'
+PKT_LEFT = OOB + b'+left'
+PKT_TIME = OOB + b'time'
+
+# Using the CDKey captured from a successful connection to rule out auth issues
+# User's CDKey: c8fe91a668eb0265b3bc52cf12dccf31
+VALID_CDKEY = "c8fe91a668eb0265b3bc52cf12dccf31"
+
+# Bytes outside printable ASCII (32..126), deleted in one bytes.translate pass
+_NON_PRINTABLE = bytes(b for b in range(256) if not 32 <= b <= 126)
+
+# CS 1.6 chat color codes
+_CHAT_COLORS = str.maketrans('', '', '\x01\x03\x04')
+
+def printable_ascii(data):
+    # bytes() is a no-op for bytes and a single copy for a memoryview
+    return bytes(data).translate(None, _NON_PRINTABLE).decode('ascii')
+
+def build_connect_info(nickname):
+    # 1. Auth Info
+    auth_info = (
+        f"\\prot\\3"
+        f"\\unique\\-1"
+        f"\\raw\\steam"
+        f"\\cdkey\\{VALID_CDKEY}"
+    )
+
+    # 2. User Info
+    # Added missing fields observed in valid client logs: cl_dlmax, _vgui_menus, _ah, _cl_autowepswitch
+    # and increased rate/updaterate to match
+    user_info = (
+        f"\\name\\{nickname}"
+        f"\\model\\gordon"
+        f"\\topcolor\\30\\bottomcolor\\6"
+        f"\\rate\\100000"
+        f"\\cl_updaterate\\102"
+        f"\\cl_lw\\1\\cl_lc\\1"
+        f"\\cl_dlmax\\512"
+        f"\\_vgui_menus\\1"
+        f"\\_ah\\1"
+        f"\\_cl_autowepswitch\\1"
+        f"\\can_voice_record\\1"
+    )
+    return auth_info.encode('ascii'), user_info.encode('ascii')
 
 # Simple function to strip colors from CS 1.6 chat (basic heuristic)
 def clean_chat_text(text):
-    return text.replace('\x01', '').replace('\x03', '').replace('\x04', '')
+    return text.translate(_CHAT_COLORS)
 
 class GoldSrcClient:
-    def __init__(self, host, port, nickname, on_chat_message=None, on_player_list=None):
+    def __init__(self, host, port, nickname, on_chat_message=None, on_player_list=None, loop=None):
         self.host = host
         self.port = port
         self.nickname = nickname
@@ -24,6 +82,12 @@ class GoldSrcClient:
         
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setblocking(False)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCK_RCVBUF)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCK_SNDBUF)
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, TOS_EF)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Socket options not applied: {e}")
         try:
             self.sock.connect((host, port))
         except Exception as e:
@@ -33,87 +97,83 @@ class GoldSrcClient:
         self.is_connected = False
         self.challenge = 0
         self.connection_step = 0 # 0: Disconnected, 1: Challenged, 2: Connected/New sent
+        self.connect_info = None # (auth_info, user_info) bytes, see build_connect_info
         
         # Async tasks
-        self.loop = asyncio.get_event_loop()
+        # Must be constructed from a coroutine unless a loop is passed in
+        self.loop = loop or asyncio.get_running_loop()
         self.keep_alive_task = None
-        self.read_task = None
+        self.join_task = None
+        self.reading = False
+        # Every datagram is received into this buffer, handle_packet gets a memoryview slice of it
+        self.recv_buf = bytearray(RECV_BUF_SIZE)
+        self.recv_view = memoryview(self.recv_buf)
         self.process_task = None
-        self.msg_queue = asyncio.Queue()
+        self.msg_queue = asyncio.Queue(maxsize=MSG_QUEUE_SIZE) # (user, text, type) for on_chat_message
 
     async def connect(self):
         logger.info(f"Connecting to {self.host}:{self.port} as {self.nickname}...")
         
         # Step 1: Request Challenge (Add newline as seen in logs)
-        self.send_packet(b'\xff\xff\xff\xffgetchallenge steam\n')
+        self.send_packet(PKT_GETCHAL)
         
-        self.read_task = self.loop.create_task(self.read_loop())
+        self.start_reading()
         # Start KeepAlive immediately
         self.keep_alive_task = self.loop.create_task(self.keep_alive())
-
-    # ... (read_loop/handle_packet remain)
-
-    def perform_connect(self):
-        # Based on captured logs:
-        # connect <proto> <challenge> "<auth_info>" "<user_info>"
-        
-        # 1. Auth Info
-        # "\prot\3\unique\-1\raw\steam\cdkey\<32chars>"
-        import hashlib
-        # Generate a semi-random cdkey based on nickname
-        cdkey_hash = hashlib.md5(self.nickname.encode()).hexdigest()
-        
-        auth_info = (
-            f"\\prot\\3"
-            f"\\unique\\-1"
-            f"\\raw\\steam"
-            f"\\cdkey\\{cdkey_hash}"
-        )
-
-        # 2. User Info
-        # "\topcolor\30\bottomcolor\6\rate\25000\cl_updaterate\100\cl_lw\1\cl_lc\1\model\gordon\name\..."
-        user_info = (
-            f"\\name\\{self.nickname}"
-            f"\\model\\gordon"
-            f"\\topcolor\\30\\bottomcolor\\6"
-            f"\\rate\\25000\\cl_updaterate\\101\\cl_lw\\1\\cl_lc\\1"
-            f"\\can_voice_record\\1"
-        )
-        
-        cmd = f'connect {PROTO_VERSION} {self.challenge} "{auth_info}" "{user_info}"'
-        packet = b'\xff\xff\xff\xff' + cmd.encode('ascii')
-        logger.info(f"Sending connect: {cmd}")
-        self.send_packet(packet)
+        self.process_task = self.loop.create_task(self.process_messages())
 
     def send_packet(self, data):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("OUT (%d): %s", len(data), data.hex())
+        self.send_raw(data)
+
+    def send_raw(self, data):
+        # No packet logging - for repeated/scheduled sends of constant packets
         try:
-            logger.info(f"OUT ({len(data)}): {data.hex()}")
             self.sock.send(data)
         except Exception as e:
             logger.error(f"Send error: {e}")
 
-    async def read_loop(self):
+    def start_reading(self):
+        # Reader callback instead of one awaited sock_recv per datagram
         logger.info("Started UDP read loop")
-        while True:
+        self.loop.add_reader(self.sock.fileno(), self.on_readable)
+        self.reading = True
+
+    def on_readable(self):
+        # Drain everything already queued in the kernel (up to RECV_BATCH) in one wakeup.
+        # Packets are handled one by one since they share recv_buf
+        recv_into = self.sock.recv_into
+        buf = self.recv_buf
+        view = self.recv_view
+        handle_packet = self.handle_packet
+        for _ in range(RECV_BATCH):
             try:
-                data = await self.loop.sock_recv(self.sock, 65535)
-                logger.info(f"IN ({len(data)}): {data.hex()}")
-                self.handle_packet(data)
-            except asyncio.CancelledError:
+                n = recv_into(buf)
+            except BlockingIOError:
+                break
+            except Exception as e:
+                logger.error(f"Read error: {e}")
                 break
+
+            try:
+                data = view[:n]
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("IN (%d): %s", n, data.hex())
+                handle_packet(data)
             except Exception as e:
                 logger.error(f"Read error: {e}")
-                await asyncio.sleep(0.1)
 
     def handle_packet(self, data):
+        # data is a memoryview into recv_buf - only valid until the next receive, copy anything kept
         if len(data) < 5: return
 
         # Header check
-        if data.startswith(b'\xff\xff\xff\xff'):
+        if data[:4] == OOB:
             # Connectionless Packet (OOB)
             payload = data[4:]
             header = payload[0:1]
-            content = payload[1:]
+            content = payload[1:].tobytes()
 
             if header == b'A': # S2C_CHALLENGE (0x41)
                 # "A00000000 <challenge> <auth>"
@@ -145,18 +205,15 @@ class GoldSrcClient:
             # But we can try to inspect plaintext usage or keep-alives.
             
             # Very basic chatter monitoring (Best Effort)
-            try:
-                decoded = data.decode('latin-1', errors='ignore')
-                if "sv_drop" in decoded or "Dropped" in decoded:
-                    logger.warning("Possible drop message received")
-                
-                # Chat heuristic
-                clean = "".join(c for c in decoded if c.isprintable())
-                if len(clean) > 5 and ("Console" in clean or " :" in clean):
-                     if self.on_chat_message:
-                        asyncio.create_task(self.on_chat_message("Game", clean[:100], "game"))
-            except:
-                pass
+            # printable_ascii keeps only bytes 32..126, so the ascii decode can't fail
+            clean = printable_ascii(data)
+            if "sv_drop" in clean or "Dropped" in clean:
+                logger.warning("Possible drop message received")
+            
+            # Chat heuristic
+            if len(clean) > 5 and ("Console" in clean or " :" in clean):
+                 if self.on_chat_message:
+                    self.queue_chat_message("Game", clean[:100], "game")
 
             # If we are receiving NetChan packets, we are "Connected".
             if not self.is_connected:
@@ -166,80 +223,79 @@ class GoldSrcClient:
                 # Step 3: Send 'new' to finish joining
                 self.send_new()
             
-            # Simple Heuristic Chat Parsing
+            # Simple Heuristic Chat Parsing (debug only - nothing but the log consumes it)
             # NetChan packets usually have an 8-byte header (Sequence + Ack) if not OOB (ffffffff)
             # data[0:4] = Sequence, data[4:8] = Ack Sequence
-            
-            payload = data
-            if len(data) > 8 and not data.startswith(b'\xff\xff\xff\xff'):
-                payload = data[8:] # Skip NetChan header
+            if not logger.isEnabledFor(logging.DEBUG):
+                return
+
+            # Already known not to be OOB here; data is a memoryview, so the slice doesn't copy
+            payload = data[8:] if len(data) > 8 else data # Skip NetChan header
                 
-            try:
-                # Filter for printable characters in the payload
-                decoded = ''.join([chr(b) if 32 <= b <= 126 else '' for b in payload])
-                # Only log if line looks meaningful (longer than 3 chars)
-                if len(decoded) > 3:
-                    logger.info(f"Packet payload string: {decoded}")
-                    
-                    # Basic Chat detection (svc_print sometimes just sends text)
-                    if "SayText" in decoded or " : " in decoded:
-                         # Emit to frontend
-                         # We need a reference to 'sio' here, or use a callback.
-                         # For now, we rely on the logger which the user sees.
-                         pass
-            except:
-                pass
+            # Filter for printable characters in the payload
+            decoded = printable_ascii(payload)
+            # Only log if line looks meaningful (longer than 3 chars)
+            if len(decoded) > 3:
+                logger.debug("Packet payload string: %s", decoded)
+                
+                # Basic Chat detection (svc_print sometimes just sends text)
+                if "SayText" in decoded or " : " in decoded:
+                     # Emit to frontend
+                     # We need a reference to 'sio' here, or use a callback.
+                     # For now, we rely on the logger which the user sees.
+                     pass
 
     def perform_connect(self):
         # Based on captured logs:
         # connect <proto> <challenge> "<auth_info>" "<user_info>"
-        
-        # 1. Auth Info
-        # Using the CDKey captured from a successful connection to rule out auth issues
-        # User's CDKey: c8fe91a668eb0265b3bc52cf12dccf31
-        valid_cdkey = "c8fe91a668eb0265b3bc52cf12dccf31"
-        
-        auth_info = (
-            f"\\prot\\3"
-            f"\\unique\\-1"
-            f"\\raw\\steam"
-            f"\\cdkey\\{valid_cdkey}"
-        )
-
-        # 2. User Info
-        # Added missing fields observed in valid client logs: cl_dlmax, _vgui_menus, _ah, _cl_autowepswitch
-        # and increased rate/updaterate to match
-        user_info = (
-            f"\\name\\{self.nickname}"
-            f"\\model\\gordon"
-            f"\\topcolor\\30\\bottomcolor\\6"
-            f"\\rate\\100000"
-            f"\\cl_updaterate\\102"
-            f"\\cl_lw\\1\\cl_lc\\1"
-            f"\\cl_dlmax\\512"
-            f"\\_vgui_menus\\1"
-            f"\\_ah\\1"
-            f"\\_cl_autowepswitch\\1"
-            f"\\can_voice_record\\1"
-        )
-        
-        cmd = f'connect {PROTO_VERSION} {self.challenge} "{auth_info}" "{user_info}"'
-        packet = b'\xff\xff\xff\xff' + cmd.encode('ascii')
-        logger.info(f"Sending connect: {cmd}")
+        # auth/user info only depend on the nickname - built once, only the challenge changes per attempt
+        if self.connect_info is None:
+            self.connect_info = build_connect_info(self.nickname)
+        auth_info, user_info = self.connect_info
+
+        packet = b''.join([
+            PKT_CONNECT, PROTO_VERSION_BYTES, b' ', str(self.challenge).encode('ascii'),
+            b' "', auth_info, b'" "', user_info, b'"'
+        ])
+        logger.info("Sending connect: %s", packet[4:].decode('ascii'))
         self.send_packet(packet)
 
     def send_new(self):
         # The 'new' command tells the server we are ready to enter the game world.
         # Sent as: \xff\xff\xff\xffnew
         logger.info("Sending 'new' command...")
-        self.send_packet(b'\xff\xff\xff\xffnew')
+        self.send_packet(PKT_NEW)
         
-        # Join Terrorist team (1) to enable voice/chat
-        self.loop.call_later(1.0, self.send_packet, b'\xff\xff\xff\xffjointeam 1')
-        self.loop.call_later(1.5, self.send_packet, b'\xff\xff\xff\xffjoinclass 1') # Select Phoenix
-        self.loop.call_later(2.0, self.send_packet, b'\xff\xff\xff\xff+left')
+        # One task for the whole join sequence instead of three separate timers
+        self.join_task = self.loop.create_task(self.post_new_sequence())
         logger.info("Scheduled 'jointeam 1' (Terrorist) + Spin")
 
+    async def post_new_sequence(self):
+        # Join Terrorist team (1) to enable voice/chat
+        await asyncio.sleep(1.0)
+        self.send_raw(PKT_JOINTEAM1)
+        await asyncio.sleep(0.5)
+        self.send_raw(PKT_JOINCLASS1) # Select Phoenix
+        await asyncio.sleep(0.5)
+        self.send_raw(PKT_LEFT)
+
+    def queue_chat_message(self, user, text, type):
+        # One long-lived consumer instead of a Task per chat line
+        try:
+            self.msg_queue.put_nowait((user, text, type))
+        except asyncio.QueueFull:
+            logger.warning("Chat queue full, dropping message")
+
+    async def process_messages(self):
+        while True:
+            try:
+                user, text, type = await self.msg_queue.get()
+                await self.on_chat_message(user, text, type)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Chat callback error: {e}")
+
     async def keep_alive(self):
         logger.info("Starting KeepAlive task")
         while True:
@@ -247,7 +303,7 @@ class GoldSrcClient:
                 # Basic KeepAlive
                 if self.is_connected:
                      # Send 'time' to query server time (OOB keepalive)
-                     self.send_packet(b'\xff\xff\xff\xfftime')
+                     self.send_raw(PKT_TIME)
                      
                      # Try to send 'cmd' to keep "active" status? 
                      # \xff\xff\xff\xffcmd +left might not work OOB, but worth a try
@@ -259,8 +315,12 @@ class GoldSrcClient:
 
     def close(self):
         self.is_connected = False
-        if self.read_task: self.read_task.cancel()
+        if self.reading:
+            self.loop.remove_reader(self.sock.fileno())
+            self.reading = False
         if self.keep_alive_task: self.keep_alive_task.cancel()
+        if self.process_task: self.process_task.cancel()
+        if self.join_task: self.join_task.cancel()
         try:
             self.sock.close()
         except:
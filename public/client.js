@@ -101,7 +101,7 @@ socket.on('chat_message', (data) => {
     }
 });
 
-socket.on('server_info', (info) => {
+function updateServerInfo(info) {
     if (info) {
         // Update Header
         if (info.name) serverNameSpan.textContent = info.name;
@@ -136,10 +136,10 @@ socket.on('server_info', (info) => {
         document.getElementById('info-version').textContent = info.version || '-';
         document.getElementById('info-tags').textContent = info.tags || '-';
     }
-});
+}
 
 // User list (Scoreboard)
-socket.on('player_list_update', (players) => {
+function updatePlayerList(players) {
     userList.innerHTML = '';
     // Sort by score (Frags) descending
     players.sort((a, b) => b.score - a.score);
@@ -165,6 +165,13 @@ socket.on('player_list_update', (players) => {
         li.appendChild(scoreSpan);
         userList.appendChild(li);
     });
+}
+
+// Poller state: { info: <server info or null>, players: [...] }
+socket.on('server_state', (state) => {
+    // info is only sent when it was refreshed on this tick
+    if (state.info) updateServerInfo(state.info);
+    if (state.players) updatePlayerList(state.players);
 });
 
 
@@ -5,10 +5,23 @@ import sys
 LOCAL_PORT = 27016        # Port to listen on (connect your game here: connect localhost:27016)
 REMOTE_IP = "93.157.172.40" # Target Server IP (from your logs)
 REMOTE_PORT = 27015       # Target Server Port
+DEBUG_LOG = True          # Dump every forwarded packet to stdout and proxy.log
+RCVBUF_SIZE = 4 << 20     # Kernel receive buffer (4 MiB) to absorb server bursts
+SNDBUF_SIZE = 256 << 10   # Kernel send buffer
+TOS_EF = 0xB8             # DSCP Expedited Forwarding (voice)
+
+def log_packet(log_f, title, data):
+    # Print nicely for us to copy-paste into our python script
+    log_msg = f"\n{title} ({len(data)} bytes)\nHex: {data.hex()}\nStr: {str(data, 'latin-1', 'replace')}\n"
+    print(log_msg)
+    log_f.write(log_msg.encode('utf-8'))
 
 def main():
     # Create UDP socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SNDBUF_SIZE)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, TOS_EF)
     sock.bind(('0.0.0.0', LOCAL_PORT))
     
     print(f"[*] UDP Proxy listening on 0.0.0.0:{LOCAL_PORT}")
@@ -16,50 +29,57 @@ def main():
     print(f"[*] INSTRUCTION: Open your CS 1.6 console (~) and type: connect 127.0.0.1:{LOCAL_PORT}")
     
     client_addr = None
+    # Resolve once - the loop compares every sender against this
+    remote_addr = (socket.gethostbyname(REMOTE_IP), REMOTE_PORT)
     
-    while True:
-        try:
-            data, addr = sock.recvfrom(65535)
-            
-            if addr == client_addr:
-                # Direction: Client -> Server
-                # Print nicely for us to copy-paste into our python script
-                log_msg = f"\n[CLIENT -> SERVER] ({len(data)} bytes)\nHex: {data.hex()}\nStr: {data.decode('latin-1', errors='replace')}\n"
-                print(log_msg)
-                with open("proxy.log", "a") as f:
-                    f.write(log_msg)
-                
-                sock.sendto(data, (REMOTE_IP, REMOTE_PORT))
+    # Opened once and buffered - flushed on exit instead of open/close per packet
+    log_f = open("proxy.log", "ab", buffering=65536) if DEBUG_LOG else None
+    
+    # One receive buffer for the whole session, packets are forwarded as memoryview slices of it
+    buf = bytearray(65535)
+    view = memoryview(buf)
+    
+    try:
+        while True:
+            try:
+                n, addr = sock.recvfrom_into(buf)
+                data = view[:n]
                 
-            else:
-                # If we received from someone who is NOT the known client, check if it's the server
-                if addr[0] == socket.gethostbyname(REMOTE_IP) and addr[1] == REMOTE_PORT:
-                    # Direction: Server -> Client
-                    if client_addr:
-                        sock.sendto(data, client_addr)
-                        # Log server responses to debug rejection
-                        log_msg = f"\n[SERVER -> CLIENT] ({len(data)} bytes)\nHex: {data.hex()}\nStr: {data.decode('latin-1', errors='replace')}\n"
-                        print(log_msg)
-                        with open("proxy.log", "a") as f:
-                            f.write(log_msg)
-                else:
-                    # New Client
-                    client_addr = addr
-                    print(f"[*] New Client connected: {client_addr}")
+                if addr == client_addr:
+                    # Direction: Client -> Server
+                    if DEBUG_LOG:
+                        log_packet(log_f, "[CLIENT -> SERVER]", data)
                     
-                    # Forward packet
-                    log_msg = f"\n[CLIENT -> SERVER] (First Packet) ({len(data)} bytes)\nHex: {data.hex()}\nStr: {data.decode('latin-1', errors='replace')}\n"
-                    print(log_msg)
-                    with open("proxy.log", "a") as f:
-                        f.write(log_msg)
+                    sock.sendto(data, remote_addr)
                     
-                    sock.sendto(data, (REMOTE_IP, REMOTE_PORT))
+                else:
+                    # If we received from someone who is NOT the known client, check if it's the server
+                    if addr == remote_addr:
+                        # Direction: Server -> Client
+                        if client_addr:
+                            sock.sendto(data, client_addr)
+                            # Log server responses to debug rejection
+                            if DEBUG_LOG:
+                                log_packet(log_f, "[SERVER -> CLIENT]", data)
+                    else:
+                        # New Client
+                        client_addr = addr
+                        print(f"[*] New Client connected: {client_addr}")
+                        
+                        # Forward packet
+                        if DEBUG_LOG:
+                            log_packet(log_f, "[CLIENT -> SERVER] (First Packet)", data)
+                        
+                        sock.sendto(data, remote_addr)
 
-    except KeyboardInterrupt:
-        print("\nExiting...")
-        break
-    except Exception as e:
-        print(f"Error: {e}")
+            except KeyboardInterrupt:
+                print("\nExiting...")
+                break
+            except Exception as e:
+                print(f"Error: {e}")
+    finally:
+        if log_f:
+            log_f.close()
 
 if __name__ == "__main__":
     main()